@@ -1,70 +1,152 @@
 import os
+import threading
+import time
 import google.generativeai as genai
+from google.generativeai import client as genai_client
 from google.api_core import exceptions as google_exceptions
 import streamlit as st
 
-# Cache use kar rahe hai taaki bar bar keys load na karni pade
-@st.cache_data(show_spinner=False)
+# Local development ke liye .env file try kar rahe hai < import pe ek hi baar load hogi >
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Keys process me ek baar load hongi, har session me dobara nahi
+@st.cache_resource(show_spinner=False)
 def get_api_keys():
     """
     Gemini API keys load karne ke liye function.
-    Pehle secrets check karega fir env variables.
+    Secrets aur env variables dono check karega.
     """
-    # Local development ke liye .env file try kar rahe hai
-    try:
-        from dotenv import load_dotenv
-        load_dotenv()
-    except ImportError:
-        pass
-
-    # Set use kiya hai taaki duplicate keys na aaye
-    keys = set()
-    try:
-        if "GEMINI_API_KEY_1" in st.secrets: keys.add(st.secrets["GEMINI_API_KEY_1"])
-        if "GEMINI_API_KEY_2" in st.secrets: keys.add(st.secrets["GEMINI_API_KEY_2"])
-        if "GEMINI_API_KEY_3" in st.secrets: keys.add(st.secrets["GEMINI_API_KEY_3"])
-        if "GEMINI_API_KEY_4" in st.secrets: keys.add(st.secrets["GEMINI_API_KEY_4"])
-    except st.errors.StreamlitAPIException:
-        pass
-    # Environment variables check karne ke liye
-    if os.getenv("GEMINI_API_KEY_1"): keys.add(os.getenv("GEMINI_API_KEY_1"))
-    if os.getenv("GEMINI_API_KEY_2"): keys.add(os.getenv("GEMINI_API_KEY_2"))
-    if os.getenv("GEMINI_API_KEY_3"): keys.add(os.getenv("GEMINI_API_KEY_3"))
-    if os.getenv("GEMINI_API_KEY_4"): keys.add(os.getenv("GEMINI_API_KEY_4"))
-    
-    return [k for k in keys if k]
-
-def generate_with_failover(prompt: str, model_name: str = "gemini-2.5-flash-lite", file_name: str | None = None, system_instruction: str | None = None) -> str:
+    def _read():
+        for i in range(1, 5):
+            for source in (lambda k: st.secrets.get(k), os.getenv):
+                try:
+                    yield source(f"GEMINI_API_KEY_{i}")
+                except Exception:
+                    pass
+
+    # dict.fromkeys se duplicate hatenge aur order bhi same rahega < failover order fixed rahe >
+    return tuple(k for k in dict.fromkeys(_read()) if k)
+
+# Generated responses ka chhota TTL cache < streaming ke saath st.cache_data kaam nahi karta >
+RESPONSE_TTL = 3600
+RESPONSE_MAX_ENTRIES = 64
+_responses: dict[tuple, tuple[float, str]] = {}
+_responses_lock = threading.Lock()
+
+def _cached_response(key: tuple) -> str | None:
+    with _responses_lock:
+        entry = _responses.get(key)
+    if entry and time.monotonic() - entry[0] < RESPONSE_TTL:
+        return entry[1]
+    return None
+
+def _store_response(key: tuple, text: str) -> None:
+    with _responses_lock:
+        _responses.pop(key, None)
+        _responses[key] = (time.monotonic(), text)
+        # Sabse purani entries hata denge
+        while len(_responses) > RESPONSE_MAX_ENTRIES:
+            _responses.pop(next(iter(_responses)))
+
+# genai.configure global hai, isliye configure + client uthana ek lock ke andar karenge
+# < warna dusra session beech me apni key configure kar sakta hai >
+_genai_lock = threading.Lock()
+
+# Model object ek baar banake reuse karenge < har call pe naya client setup na ho >
+@st.cache_resource(show_spinner=False)
+def _get_model(api_key: str, model_name: str, system_instruction: str | None):
+    with _genai_lock:
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction
+        )
+        # GenerativeModel key yaad nahi rakhta, pehli call pe jo global client ho wahi le leta hai
+        # Isliye isi key ka client abhi bind kar dete hai
+        model._client = genai_client.get_default_generative_client()
+    return model
+
+def _get_file(api_key: str, file_name: str):
+    # get_file hamesha global client use karta hai, isliye pehle isi key ko configure karenge
+    with _genai_lock:
+        genai.configure(api_key=api_key)
+        return genai.get_file(file_name)
+
+class StreamInterrupted(Exception):
     """
-    Content generate karne ke liye function.
+    Kuch text aane ke baad stream toot jaye to raise hota hai.
+    Message "ERROR:" se shuru hota hai; adhura response save/cache nahi karna.
+    """
+
+def _stream_uncached(prompt: str, model_name: str, file_name: str | None, system_instruction: str | None, out: list[str]):
+    """
+    Content stream karne ke liye generator.
     Agar ek key limit reach kar jaye to dusri use karega (Failover logic).
+    Successful text `out` me jodta hai aur success hone par True return karta hai.
+    Beech me stream toote to StreamInterrupted raise karta hai.
     """
     # Keys load karne ke liye
     api_keys = get_api_keys()
     if not api_keys:
-        return "ERROR: No API keys configured."
+        yield "ERROR: No API keys configured."
+        return False
 
     # Har key try karke dekhenga jab tak ek key work nhi kre 
     for key in api_keys:
+        started = False
         try:
-            # API key set karge if key mil jaayegi toh 
-            genai.configure(api_key=key)
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                system_instruction=system_instruction
-            )
+            # Is key ka model cache se lenge
+            model = _get_model(key, model_name, system_instruction)
 
             # Content prepare karne ke liye 
             content = [prompt]
             if file_name:
-                content.insert(0, genai.get_file(file_name))
+                content.insert(0, _get_file(key, file_name))
+
+            # Chunks aate hi UI ko bhej denge < pura response ka wait nahi karna >
+            for chunk in model.generate_content(content, stream=True):
+                text = chunk.text or ""
+                if text:
+                    started = True
+                    out.append(text)
+                    yield text
 
-            resp = model.generate_content(content)
-            return (resp.text or "").strip() or "ERROR: Empty response from model."
+            if not started:
+                yield "ERROR: Empty response from model."
+                return False
+            return True
         except google_exceptions.ResourceExhausted:
             # Agar quota khatam ho jaaye to next key try karega <heart of tis project to keep it free >
-            continue
+            # Text aadha aa chuka ho to failover nahi kar sakte
+            if not started:
+                continue
+            raise StreamInterrupted("ERROR: Response interrupted because the API key got rate-limited.")
         except Exception as e:
-            return f"ERROR: An unexpected error occurred: {e}"
+            if started:
+                raise StreamInterrupted(f"ERROR: Response interrupted: {e}") from e
+            yield f"ERROR: An unexpected error occurred: {e}"
+            return False
+
+    yield "ERROR: All API keys are currently rate-limited. Please wait and try again."
+    return False
+
+def generate_with_failover(prompt: str, model_name: str = "gemini-2.5-flash-lite", file_name: str | None = None, system_instruction: str | None = None):
+    """
+    Response ko chunks me yield karta hai, st.write_stream ke saath use karne ke liye.
+    Successful responses 1 ghante tak yaad rakhega, ERROR wale cache nahi honge.
+    """
+    # Same prompt dubara aaye to API hit nahi karenge < quota bachane ke liye >
+    cache_key = (prompt, model_name, file_name, system_instruction)
+    cached = _cached_response(cache_key)
+    if cached is not None:
+        yield cached
+        return
 
-    return "ERROR: All API keys are currently rate-limited. Please wait and try again."
\ No newline at end of file
+    parts = []
+    ok = yield from _stream_uncached(prompt, model_name, file_name, system_instruction, parts)
+    if ok:
+        _store_response(cache_key, "".join(parts).strip())
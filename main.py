@@ -1,9 +1,13 @@
+import io
+import json
+import warnings
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import google.generativeai as genai
-from gemini_api import get_api_keys, generate_with_failover
+from gemini_api import get_api_keys, generate_with_failover, StreamInterrupted
 
 # Page config set karne ke liye 
 img = "logo/logo.png" 
@@ -13,11 +17,183 @@ st.set_page_config(
     page_icon=img
 )
 
+# Isse zyada rows hone par scatter/line charts WebGL se render honge
+WEBGL_THRESHOLD = 5000
+# Line charts ko itne points tak downsample karenge < screen pe isse zyada pixels hi nahi hote >
+LTTB_POINTS = 2000
+# Scatter plot ke liye isse zyada rows hone par random sample bhejenge
+PLOT_SAMPLE_ROWS = 20000
+# In charts ke settings form me aate hai
+CONFIGURABLE_CHARTS = ("Bar Chart", "Line Chart", "Scatter Plot", "Histogram", "Box Plot", "Pie Chart")
+# AI prompt me itne hi columns ki details jayengi
+MAX_PROMPT_COLS = 20
+
 # Session state initialize kar rahe hai taaki data reload na ho
 if 'df' not in st.session_state:
     st.session_state.df = None
 if 'insights' not in st.session_state:
     st.session_state.insights = None
+if 'file_id' not in st.session_state:
+    st.session_state.file_id = None
+
+def _parse(name: str, data: bytes) -> pd.DataFrame:
+    # Pehle fast parsers (pyarrow / calamine) try karenge, fail ho to default engine
+    if name.endswith('.csv'):
+        try:
+            return pd.read_csv(io.BytesIO(data), engine="pyarrow")
+        except (ImportError, ValueError):
+            return pd.read_csv(io.BytesIO(data))
+    try:
+        return pd.read_excel(io.BytesIO(data), engine="calamine")
+    except (ImportError, ValueError):
+        return pd.read_excel(io.BytesIO(data))
+
+def _to_categories(df: pd.DataFrame, max_ratio: float = 0.5) -> pd.DataFrame:
+    """Kam unique values wale text columns ko category bana dete hai < groupby/filter fast, RAM kam >."""
+    if len(df) == 0:
+        return df
+    for c in df.select_dtypes(include=['object', 'string']).columns:
+        if df[c].nunique(dropna=False) / len(df) < max_ratio:
+            df[c] = df[c].astype('category')
+    return df
+
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """int64/float64 ko chhote dtypes me convert karte hai < aadhi memory, fast reductions >."""
+    for c in df.select_dtypes('integer').columns:
+        df[c] = pd.to_numeric(df[c], downcast='integer')
+    for c in df.select_dtypes('float').columns:
+        small = pd.to_numeric(df[c], downcast='float')
+        # Sirf tab float32 karenge jab wapas float64 karne par har value bilkul same aaye
+        # < 12345.67 jaisi values float32 me badal jaati hai, isliye tolerance nahi >
+        if np.array_equal(small.to_numpy(dtype=np.float64, na_value=np.nan),
+                          df[c].to_numpy(dtype=np.float64, na_value=np.nan), equal_nan=True):
+            df[c] = small
+    return df
+
+# File parse karne ke liye < bytes hash hote hai toh same file dubara parse nahi hogi >
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_df(name: str, data: bytes) -> pd.DataFrame:
+    return _to_categories(_downcast(_parse(name, data)))
+
+def _corr(numeric_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Correlation matrix NumPy se float32 me nikalte hai < pandas ke pairwise loop se fast >.
+    Missing values column mean se bhar dete hai.
+    """
+    cols = numeric_df.columns
+    arr = np.ascontiguousarray(numeric_df.to_numpy(dtype=np.float32, na_value=np.nan))
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        arr = np.where(np.isnan(arr), np.nanmean(arr, axis=0), arr)
+        corr = np.corrcoef(arr, rowvar=False, dtype=np.float32) if len(cols) else np.empty((0, 0))
+    return pd.DataFrame(np.atleast_2d(corr), index=cols, columns=cols)
+
+# Summary ek baar per dataset compute karne ke liye
+# < cache key uploaded file ki id hai; `_df` ko Streamlit hash nahi karta kyunki poora df hash karna mehenga hai >
+@st.cache_data(show_spinner=False, max_entries=4)
+def summarize(file_key: str, _df: pd.DataFrame) -> dict:
+    # Null mask ek hi baar banake counts bhi usi se nikal rahe hai
+    nulls = _df.isna().sum()
+    numeric_df = _df.select_dtypes('number')
+    counts = len(_df) - nulls
+    col_info = pd.DataFrame({
+        'Column': _df.columns,
+        'Type': _df.dtypes.astype(str).to_numpy(),
+        'Non-Null': counts.values,
+        'Null': nulls.values
+    })
+    return dict(
+        describe=_df.describe(),
+        nulls=nulls,
+        total_nulls=int(nulls.to_numpy().sum()),
+        counts=counts,
+        dtypes=_df.dtypes,
+        col_info=col_info,
+        all_cols=_df.columns.tolist(),
+        numeric_cols=numeric_df.columns.tolist(),
+        corr=_corr(numeric_df)
+    )
+
+# Digest bhi per dataset ek hi baar banega < button dobara dabane pe rebuild nahi hoga >
+@st.cache_data(show_spinner=False, max_entries=4)
+def _prompt_context(file_key: str, _df: pd.DataFrame, top_k: int = 5) -> str:
+    """
+    AI prompt ke liye dataset ka compact JSON digest.
+    .to_string() tables se kaafi chhota hota hai < kam tokens, fast response >.
+    Wide data me sirf pehle MAX_PROMPT_COLS columns bhejte hai taaki prompt limit me rahe.
+    """
+    summary = summarize(file_key, _df)
+    cols = _df.columns[:MAX_PROMPT_COLS]
+    categorical = _df[cols].select_dtypes(exclude=['number', 'datetime']).columns
+    nulls = summary["nulls"]
+    digest = {
+        "shape": _df.shape,
+        "dtypes": {c: str(t) for c, t in summary["dtypes"][cols].items()},
+        "describe": summary["describe"].iloc[:, :MAX_PROMPT_COLS].round(3).to_dict(),
+        "nulls": nulls[nulls > 0].head(MAX_PROMPT_COLS).to_dict(),
+        "top_values": {
+            c: {str(k): int(v) for k, v in _df[c].value_counts().head(top_k).items()}
+            for c in categorical
+        },
+        "sample": _df[cols].head(3).to_dict(orient="records")
+    }
+    return json.dumps(digest, default=str, separators=(",", ":"))
+
+def _plot_frame(df: pd.DataFrame, n: int = PLOT_SAMPLE_ROWS) -> pd.DataFrame:
+    """Bada df ho to fixed size ka random sample < browser ko poora JSON bhejne ki zarurat nahi >."""
+    return df if len(df) <= n else df.sample(n, random_state=0)
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Har bucket se wo point chunta hai jo shape ko sabse achhe se preserve kare.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean()
+        avg_y = y[end:nxt_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+def _downsample_series(df: pd.DataFrame, x: str, y: str, color: str | None, n_out: int = LTTB_POINTS) -> pd.DataFrame:
+    """Line chart ke liye har color group ko LTTB se chhota karta hai."""
+    # y None ho (koi numeric column nahi) to downsample karne ko kuch nahi hai
+    if y is None or len(df) <= n_out:
+        return df
+
+    groups = [df] if color is None else [g for _, g in df.groupby(color, sort=False, observed=True)]
+    per_group = max(3, n_out // len(groups))
+    parts = []
+    for g in groups:
+        g = g.dropna(subset=[y])
+        y_arr = g[y].to_numpy(dtype=np.float64)
+        # x numeric aur sorted ho to wahi use karenge, warna row position
+        if pd.api.types.is_numeric_dtype(g[x]) and g[x].is_monotonic_increasing:
+            x_arr = g[x].to_numpy(dtype=np.float64)
+        else:
+            x_arr = np.arange(len(g), dtype=np.float64)
+        parts.append(g.iloc[_lttb_indices(x_arr, y_arr, per_group)])
+    return pd.concat(parts)
+
+def _agg(df: pd.DataFrame, x, y: str, how: str = "sum") -> pd.DataFrame:
+    """Plotly ko raw rows bhejne ki jagah pandas me hi group karke chhota frame dete hai."""
+    keys = [k for k in dict.fromkeys(x if isinstance(x, list) else [x]) if k is not None]
+    # Numeric column hi na ho (y None) to Plotly khud row counts dikhata hai, wahi rehne denge
+    if y is None or not keys or y in keys:
+        return df
+    return df.groupby(keys, dropna=False, observed=True, sort=False)[y].agg(how).reset_index()
 
 # Main Title
 st.title("Dataset Insights Generator")
@@ -41,160 +217,159 @@ else:
 # Data load karne ka logic
 if uploaded_file:
     try:
-        if uploaded_file.name.endswith('.csv'):
-            st.session_state.df = pd.read_csv(uploaded_file)
-        else:
-            st.session_state.df = pd.read_excel(uploaded_file)
+        # Nayi file aane par hi df replace karenge < file_id hi cached summaries ki key hai >
+        if uploaded_file.file_id != st.session_state.file_id:
+            data = uploaded_file.getvalue()
+            st.session_state.df = _load_df(uploaded_file.name, data)
+            st.session_state.file_id = uploaded_file.file_id
         
         st.sidebar.success(f" Loaded {len(st.session_state.df)} rows")
     except Exception as e:
         st.sidebar.error(f"Error loading file: {e}")
 
-# Agar data hai to dashboard dikhane ka logic 
-if st.session_state.df is not None:
-    df = st.session_state.df
+# Har tab ko fragment bana rahe hai taaki widget change pe sirf wahi tab rerun ho, poori app nahi
+# Tab 1: Basic Info
+@st.fragment
+def _overview(df: pd.DataFrame, summary: dict):
+    col1, col2, col3, col4 = st.columns(4)
     
-    # Tabs create kane ke liye
-    tab1, tab2, tab3 = st.tabs([" Overview", " Visualizations", " AI Insights"])
+    with col1:
+        st.metric("Total Rows", len(df))
+    with col2:
+        st.metric("Total Columns", len(df.columns))
+    with col3:
+        st.metric("Numeric Columns", len(summary["numeric_cols"]))
+    with col4:
+        st.metric("Missing Values", summary["total_nulls"])
     
-    # Tab 1: Basic Info
-    with tab1:
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Rows", len(df))
-        with col2:
-            st.metric("Total Columns", len(df.columns))
-        with col3:
-            st.metric("Numeric Columns", len(df.select_dtypes(include=['number']).columns))
-        with col4:
-            st.metric("Missing Values", df.isnull().sum().sum())
-        
-        st.markdown("---")
-        
-        # Data ka preview
-        st.subheader(" Data Preview")
-        st.dataframe(df.head(10), use_container_width=True)
-        
-        # Column ki details
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("ℹ Column Information")
-            col_info = pd.DataFrame({
-                'Column': df.columns,
-                'Type': df.dtypes.values,
-                'Non-Null': df.count().values,
-                'Null': df.isnull().sum().values
-            })
-            st.dataframe(col_info, use_container_width=True)
-        
-        with col2:
-            st.subheader(" Statistical Summary")
-            st.dataframe(df.describe(), use_container_width=True)
+    st.markdown("---")
     
-    # Tab 2: Custom Visualizations tab starts here 
-    with tab2:
-        st.subheader(" Create Custom Visualizations")
-        
-        # Chart selection
-        chart_type = st.selectbox(
-            "Select Chart Type",
-            ["Bar Chart", "Line Chart", "Scatter Plot", "Histogram", "Box Plot", 
-             "Pie Chart", "Heatmap", "Area Chart"]
-        )
-        
-        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        all_cols = df.columns.tolist()
-        
-        col1, col2 = st.columns(2)
-        
-        # Chart logic starts from here 
-        if chart_type == "Bar Chart":
-            with col1:
-                x_axis = st.selectbox("X-axis", all_cols)
-            with col2:
-                y_axis = st.selectbox("Y-axis", numeric_cols)
+    # Data ka preview
+    st.subheader(" Data Preview")
+    st.dataframe(df.head(10), use_container_width=True)
+    
+    # Column ki details
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("ℹ Column Information")
+        st.dataframe(summary["col_info"], use_container_width=True)
+    
+    with col2:
+        st.subheader(" Statistical Summary")
+        st.dataframe(summary["describe"], use_container_width=True)
+
+# Tab 2: Custom Visualizations tab starts here 
+@st.fragment
+def _viz(df: pd.DataFrame, summary: dict):
+    st.subheader(" Create Custom Visualizations")
+    
+    # Chart selection
+    chart_type = st.selectbox(
+        "Select Chart Type",
+        ["Bar Chart", "Line Chart", "Scatter Plot", "Histogram", "Box Plot", 
+         "Pie Chart", "Heatmap", "Area Chart"]
+    )
+    
+    all_cols, numeric_cols = summary["all_cols"], summary["numeric_cols"]
+    
+    # Bade data ke liye SVG ki jagah WebGL use karenge taaki browser hang na ho
+    render_mode = "webgl" if len(df) > WEBGL_THRESHOLD else "auto"
+    
+    # Heatmap ke liye koi setting nahi hai, isliye form ki zarurat nahi
+    if chart_type == "Heatmap":
+        correlation = summary["corr"]
+        fig = px.imshow(correlation, title="Correlation Heatmap",
+                      color_continuous_scale='RdBu_r')
+    
+    # Chart settings form me rakhe hai < har widget change pe rerun nahi, sirf Render dabane pe >
+    # Form sirf unhi charts ke liye jinke settings hai, warna khali form me bekaar Render button dikhega
+    elif chart_type in CONFIGURABLE_CHARTS:
+        with st.form("chart_cfg"):
+            col1, col2 = st.columns(2)
+                
+            # Chart logic starts from here 
+            if chart_type == "Bar Chart":
+                with col1:
+                    x_axis = st.selectbox("X-axis", all_cols)
+                with col2:
+                    y_axis = st.selectbox("Y-axis", numeric_cols)
+                
+                color = st.selectbox("Color by (optional)", [None] + all_cols)
+                fig = px.bar(_agg(df, [x_axis, color], y_axis), x=x_axis, y=y_axis, color=color, title=f"{y_axis} by {x_axis}")
             
-            color = st.selectbox("Color by (optional)", [None] + all_cols)
-            fig = px.bar(df, x=x_axis, y=y_axis, color=color, title=f"{y_axis} by {x_axis}")
-        
-        elif chart_type == "Line Chart":
-            with col1:
-                x_axis = st.selectbox("X-axis", all_cols)
-            with col2:
-                y_axis = st.selectbox("Y-axis", numeric_cols)
+            elif chart_type == "Line Chart":
+                with col1:
+                    x_axis = st.selectbox("X-axis", all_cols)
+                with col2:
+                    y_axis = st.selectbox("Y-axis", numeric_cols)
+                
+                color = st.selectbox("Color by (optional)", [None] + all_cols)
+                exact = len(df) > LTTB_POINTS and st.checkbox("Exact (no downsampling)")
+                line_df = df if exact else _downsample_series(df, x_axis, y_axis, color)
+                fig = px.line(line_df, x=x_axis, y=y_axis, color=color, title=f"{y_axis} over {x_axis}",
+                              render_mode=render_mode)
             
-            color = st.selectbox("Color by (optional)", [None] + all_cols)
-            fig = px.line(df, x=x_axis, y=y_axis, color=color, title=f"{y_axis} over {x_axis}")
-        
-        elif chart_type == "Scatter Plot":
-            with col1:
-                x_axis = st.selectbox("X-axis", numeric_cols)
-            with col2:
-                y_axis = st.selectbox("Y-axis", numeric_cols)
+            elif chart_type == "Scatter Plot":
+                with col1:
+                    x_axis = st.selectbox("X-axis", numeric_cols)
+                with col2:
+                    y_axis = st.selectbox("Y-axis", numeric_cols)
+                
+                col3, col4 = st.columns(2)
+                with col3:
+                    size = st.selectbox("Size by (optional)", [None] + numeric_cols)
+                with col4:
+                    color = st.selectbox("Color by (optional)", [None] + all_cols)
+                
+                exact = len(df) > PLOT_SAMPLE_ROWS and st.checkbox("Exact (no sampling)")
+                fig = px.scatter(df if exact else _plot_frame(df), x=x_axis, y=y_axis, size=size, color=color,
+                               title=f"{y_axis} vs {x_axis}", render_mode=render_mode)
             
-            col3, col4 = st.columns(2)
-            with col3:
-                size = st.selectbox("Size by (optional)", [None] + numeric_cols)
-            with col4:
+            elif chart_type == "Histogram":
+                with col1:
+                    column = st.selectbox("Column", numeric_cols)
+                with col2:
+                    bins = st.slider("Number of bins", 10, 100, 30)
+                
                 color = st.selectbox("Color by (optional)", [None] + all_cols)
+                fig = px.histogram(df, x=column, nbins=bins, color=color,
+                                 title=f"Distribution of {column}")
             
-            fig = px.scatter(df, x=x_axis, y=y_axis, size=size, color=color,
-                           title=f"{y_axis} vs {x_axis}")
-        
-        elif chart_type == "Histogram":
-            with col1:
-                column = st.selectbox("Column", numeric_cols)
-            with col2:
-                bins = st.slider("Number of bins", 10, 100, 30)
-            
-            color = st.selectbox("Color by (optional)", [None] + all_cols)
-            fig = px.histogram(df, x=column, nbins=bins, color=color,
-                             title=f"Distribution of {column}")
-        
-        elif chart_type == "Box Plot":
-            with col1:
-                y_axis = st.selectbox("Y-axis (numeric)", numeric_cols)
-            with col2:
-                x_axis = st.selectbox("Group by (optional)", [None] + all_cols)
+            elif chart_type == "Box Plot":
+                with col1:
+                    y_axis = st.selectbox("Y-axis (numeric)", numeric_cols)
+                with col2:
+                    x_axis = st.selectbox("Group by (optional)", [None] + all_cols)
+                
+                fig = px.box(df, y=y_axis, x=x_axis, title=f"Box Plot of {y_axis}")
             
-            fig = px.box(df, y=y_axis, x=x_axis, title=f"Box Plot of {y_axis}")
-        
-        elif chart_type == "Pie Chart":
-            with col1:
-                names = st.selectbox("Categories", all_cols)
-            with col2:
-                values = st.selectbox("Values", numeric_cols)
+            elif chart_type == "Pie Chart":
+                with col1:
+                    names = st.selectbox("Categories", all_cols)
+                with col2:
+                    values = st.selectbox("Values", numeric_cols)
+                
+                fig = px.pie(_agg(df, names, values), names=names, values=values, title=f"{values} by {names}")
             
-            fig = px.pie(df, names=names, values=values, title=f"{values} by {names}")
-        
-        elif chart_type == "Heatmap":
-            correlation = df[numeric_cols].corr()
-            fig = px.imshow(correlation, title="Correlation Heatmap",
-                          color_continuous_scale='RdBu_r')
-        
-        # Chart display karne ke liye
-        if 'fig' in locals() and fig:
-            st.plotly_chart(fig, use_container_width=True)
+            st.form_submit_button("Render")
     
-    # Tab 3: AI wala part
-    with tab3:
-        st.subheader("AI-Powered Insights")
-        
-        if api_keys:
-            if st.button(" Generate AI Insights", type="primary"):
-                with st.spinner("Analyzing your data with AI..."):
-                    # Data context preparne ke liye < prompt create ke liye chat gpt use kiya hai >
-                    data_context = f"""
-Shape: {df.shape}
-Head:
-{df.head().to_string()}
-Stats:
-{df.describe().to_string()}
-"""
-                    # Prompt construct kar rahe hai
-                    prompt = f"""
+    # Chart display karne ke liye
+    if 'fig' in locals() and fig:
+        st.plotly_chart(fig, use_container_width=True)
+
+# Tab 3: AI wala part
+@st.fragment
+def _ai(df: pd.DataFrame, file_key: str, api_keys):
+    st.subheader("AI-Powered Insights")
+    
+    if api_keys:
+        if st.button(" Generate AI Insights", type="primary"):
+            with st.spinner("Analyzing your data with AI..."):
+                # Data context preparne ke liye < prompt create ke liye chat gpt use kiya hai >
+                data_context = _prompt_context(file_key, df)
+                # Prompt construct kar rahe hai
+                prompt = f"""
 
 Analyze the following dataset and extract maximum possible insights.
 
@@ -246,27 +421,51 @@ Provide insights under these sections:
 
 Return insights strictly as bullet points under each section.
 """
-                    
-                    # Failover function < heart of this project takes 2 weeks to solve >
-                    insights = generate_with_failover(prompt)
-                    
-                    if not insights.startswith("ERROR:"):
-                        st.session_state.insights = insights
-                    else:
-                        st.error(insights)
-            
-            if st.session_state.insights:
-                st.markdown(st.session_state.insights)
                 
-                # Download insights
-                st.download_button(
-                    " Download Insights",
-                    st.session_state.insights,
-                    file_name="ai_insights.txt",
-                    mime="text/plain"
-                )
-        else:
-            st.warning("⚠️ Please configure API Keys in secrets or .env file.")
+                # Failover function < heart of this project takes 2 weeks to solve >
+                # Response stream hote hote dikhayenge, poora aane ke baad neeche wala markdown le lega
+                stream_box = st.empty()
+                try:
+                    with stream_box:
+                        insights = st.write_stream(generate_with_failover(prompt))
+                except StreamInterrupted as e:
+                    # Adhura response save nahi karenge
+                    insights = str(e)
+                stream_box.empty()
+                
+                if not insights.startswith("ERROR:"):
+                    st.session_state.insights = insights
+                else:
+                    st.error(insights)
+        
+        if st.session_state.insights:
+            st.markdown(st.session_state.insights)
+            
+            # Download insights
+            st.download_button(
+                " Download Insights",
+                st.session_state.insights,
+                file_name="ai_insights.txt",
+                mime="text/plain"
+            )
+    else:
+        st.warning("⚠️ Please configure API Keys in secrets or .env file.")
+
+# Agar data hai to dashboard dikhane ka logic 
+if st.session_state.df is not None:
+    df = st.session_state.df
+    file_key = st.session_state.file_id
+    summary = summarize(file_key, df)
+    
+    # Tabs create kane ke liye
+    tab1, tab2, tab3 = st.tabs([" Overview", " Visualizations", " AI Insights"])
+    
+    with tab1:
+        _overview(df, summary)
+    with tab2:
+        _viz(df, summary)
+    with tab3:
+        _ai(df, file_key, api_keys)
     
 else:
     # Welcome screen